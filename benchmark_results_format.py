@@ -0,0 +1,82 @@
+import io
+import json
+import random
+import time
+import tracemalloc
+
+from tap import Tap
+
+from lmkg.tools import parse_results_stream, reservoir_sample, term_to_id
+
+
+class Arguments(Tap):
+    num_rows: int = 10000  # Rows in the simulated response, as in get_neighbors.sparql
+    repeats: int = 20
+
+
+def make_responses(num_rows: int) -> tuple[bytes, bytes]:
+    uris = [f"http://wikidata.org/wiki/Q{random.randint(1, 10**8)}" for _ in range(num_rows)]
+    json_response = json.dumps({
+        "head": {"vars": ["o"]},
+        "results": {"bindings": [{"o": {"type": "uri", "value": uri}} for uri in uris]}
+    }).encode()
+    tsv_response = ("?o\n" + "".join(f"<{uri}>\n" for uri in uris)).encode()
+    return json_response, tsv_response
+
+
+def parse_json(response: bytes) -> list[str]:
+    # What SPARQLWrapper's convert() and get_neighbors did before streaming
+    results = json.load(io.BytesIO(response))["results"]["bindings"]
+    random.shuffle(results)
+    output = []
+    for result in results:
+        entity_id = result["o"]["value"].split("/")[-1]
+        if entity_id.startswith("Q") or entity_id.startswith("P"):
+            output.append(entity_id)
+        if len(output) == 5:
+            break
+    return output
+
+
+def parse_tsv_sample(response: bytes) -> list[str]:
+    entity_ids = (term_to_id(r["o"]) for r in parse_results_stream(io.BytesIO(response)))
+    return reservoir_sample((i for i in entity_ids if i.startswith("Q") or i.startswith("P")), 5)
+
+
+def parse_tsv_first(response: bytes) -> list[str]:
+    output = []
+    for result in parse_results_stream(io.BytesIO(response)):
+        entity_id = term_to_id(result["o"])
+        if entity_id.startswith("Q") or entity_id.startswith("P"):
+            output.append(entity_id)
+        if len(output) == 5:
+            break
+    return output
+
+
+def measure(parse, response: bytes, repeats: int) -> tuple[float, float]:
+    start = time.perf_counter()
+    for _ in range(repeats):
+        parse(response)
+    elapsed = (time.perf_counter() - start) / repeats
+
+    tracemalloc.start()
+    parse(response)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main(args: Arguments):
+    json_response, tsv_response = make_responses(args.num_rows)
+    print(f"Response size: JSON {len(json_response) / 2**10:.0f} KB, "
+          f"TSV {len(tsv_response) / 2**10:.0f} KB")
+    print(f"{'path':<24}{'parse time (ms)':>18}{'peak memory (KB)':>18}")
+    for name, parse, response in [("json", parse_json, json_response),
+                                  ("tsv, random sample", parse_tsv_sample, tsv_response),
+                                  ("tsv, first 5", parse_tsv_first, tsv_response)]:
+        elapsed, peak = measure(parse, response, args.repeats)
+        print(f"{name:<24}{elapsed * 1000:>18.2f}{peak / 2**10:>18.0f}")
+
+
+main(Arguments().parse_args())
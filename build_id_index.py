@@ -0,0 +1,29 @@
+from tap import Tap
+
+from lmkg.id_index import IDIndex
+from lmkg.tools import GraphDBTool
+from lmkg.utils import get_logger
+
+
+class Arguments(Tap):
+    output_path: str  # Where to save the index
+    dump_path: str = None  # Triples dump to build from. If not given, the endpoint is queried.
+    graphdb_endpoint: str = "http://localhost:7200/repositories/wikidata5m"
+
+
+def main(args: Arguments):
+    logger = get_logger()
+    if args.dump_path:
+        logger.info(f"Building ID index from {args.dump_path}")
+        index = IDIndex.from_triples(args.dump_path)
+    else:
+        logger.info(f"Building ID index from {args.graphdb_endpoint}")
+        graphdb = GraphDBTool(args.graphdb_endpoint)
+        index = IDIndex(graphdb.get_all_ids())
+
+    index.save(args.output_path)
+    logger.info(f"Saved {len(index):,} identifiers to {args.output_path} "
+                f"({index.nbytes / 2**20:.1f} MB)")
+
+
+main(Arguments().parse_args())
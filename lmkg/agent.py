@@ -5,8 +5,9 @@ from langchain_openai import ChatOpenAI
 from langgraph.prebuilt import create_react_agent, ToolNode
 import pydantic
 
+from .id_index import IDIndex
 from .tools import AnswerStoreTool, GraphDBTool
-from .utils import build_task_input
+from .utils import build_task_input, get_logger
 
 
 class LMKGAgent:
@@ -22,15 +23,28 @@ class LMKGAgent:
         graphdb_endpoint (str): The URL endpoint for accessing the graph database.
         timeout (int, optional): The maximum time in seconds to allow for agent execution.
         recursion_limit (int, optional): The maximum recursion depth for the agent's execution.
+        max_batch_size (int, optional): The maximum number of identifiers accepted by a
+            single call to a batch function.
+        id_index_path (str, optional): Path to a precomputed IDIndex file. If given, existence
+            and hallucination checks are done in memory instead of querying the graph database.
     """
     def __init__(self,
                  functions: list[str],
                  graphdb_endpoint: str,
                  answer_parser: Callable[[str], tuple[Any, set[str]]] = None,
                  timeout: int = None,
-                 recursion_limit: int = None):
+                 recursion_limit: int = None,
+                 max_batch_size: int = 10,
+                 id_index_path: str = None):
         self.graphdb_endpoint = graphdb_endpoint
-        self.graphdb = GraphDBTool(graphdb_endpoint, functions)
+
+        id_index = None
+        if id_index_path is not None:
+            id_index = IDIndex.load(id_index_path)
+            get_logger().info(f"Loaded {len(id_index):,} identifiers from {id_index_path} "
+                              f"({id_index.nbytes / 2**20:.1f} MB)")
+
+        self.graphdb = GraphDBTool(graphdb_endpoint, functions, max_batch_size, id_index)
         self.answer_store = AnswerStoreTool(self.graphdb, answer_parser)
         tool_list = self.graphdb.tools + self.answer_store.tools
 
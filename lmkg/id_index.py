@@ -0,0 +1,103 @@
+import struct
+from typing import Iterable
+
+
+class IDIndex:
+    """Compact in-memory membership index for the Q and P identifiers in a
+    knowledge graph.
+
+    Identifiers are stored in two bitsets indexed by their numeric part, so
+    that membership checks are in-memory lookups instead of SPARQL queries.
+    Memory use is one bit per number up to the largest ID in the graph.
+    """
+    # Current Wikidata IDs are far below this, and each bitset stays under 128 MB
+    MAX_NUMBER = 10**9
+    WIKI_PREFIX = "<http://wikidata.org/wiki/"
+    _MAGIC = b"LMKGIDX1"
+    _HEADER = struct.Struct("<8sQQQ")
+
+    def __init__(self, identifiers: Iterable[str] = None):
+        self.bitsets = {"Q": bytearray(), "P": bytearray()}
+        self.num_ids = 0
+        if identifiers is not None:
+            for identifier in identifiers:
+                self.add(identifier)
+
+    @staticmethod
+    def _split(identifier: str):
+        prefix, number = identifier[:1], identifier[1:]
+        if prefix not in ("Q", "P") or not (number.isascii() and number.isdigit()):
+            return None, None
+        # Q042 is not the same identifier as Q42, and Wikidata IDs start at 1
+        if number.startswith("0"):
+            return None, None
+        return prefix, int(number)
+
+    def add(self, identifier: str):
+        prefix, number = self._split(identifier)
+        if prefix is None:
+            raise ValueError(f"Invalid identifier {identifier}")
+        if number > self.MAX_NUMBER:
+            raise ValueError(f"Identifier {identifier} exceeds the maximum of {self.MAX_NUMBER}")
+
+        bitset = self.bitsets[prefix]
+        byte, bit = divmod(number, 8)
+        if byte >= len(bitset):
+            bitset.extend(bytes(byte + 1 - len(bitset)))
+        if not bitset[byte] >> bit & 1:
+            bitset[byte] |= 1 << bit
+            self.num_ids += 1
+
+    def __contains__(self, identifier: str) -> bool:
+        prefix, number = self._split(identifier)
+        if prefix is None:
+            return False
+
+        bitset = self.bitsets[prefix]
+        byte, bit = divmod(number, 8)
+        return byte < len(bitset) and bool(bitset[byte] >> bit & 1)
+
+    def __len__(self):
+        return self.num_ids
+
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the bitsets, in bytes."""
+        return sum(len(bitset) for bitset in self.bitsets.values())
+
+    def save(self, path: str):
+        with open(path, "wb") as f:
+            f.write(self._HEADER.pack(self._MAGIC, self.num_ids,
+                                      len(self.bitsets["Q"]), len(self.bitsets["P"])))
+            f.write(self.bitsets["Q"])
+            f.write(self.bitsets["P"])
+
+    @classmethod
+    def load(cls, path: str) -> "IDIndex":
+        index = cls()
+        with open(path, "rb") as f:
+            magic, num_ids, q_size, p_size = cls._HEADER.unpack(f.read(cls._HEADER.size))
+            if magic != cls._MAGIC:
+                raise ValueError(f"{path} is not an ID index file")
+            index.bitsets["Q"] = bytearray(f.read(q_size))
+            index.bitsets["P"] = bytearray(f.read(p_size))
+        index.num_ids = num_ids
+        return index
+
+    @classmethod
+    def from_triples(cls, path: str) -> "IDIndex":
+        """Build the index from a triples dump, either tab-separated
+        identifiers as in Wikidata5M or N-Triples with Wikidata URIs. URIs
+        from other namespaces are ignored."""
+        index = cls()
+        with open(path) as f:
+            for line in f:
+                # Only the subject, predicate, and the start of the object can be IDs
+                for term in line.split(maxsplit=3)[:3]:
+                    if term.startswith(cls.WIKI_PREFIX) and term.endswith(">"):
+                        identifier = term[len(cls.WIKI_PREFIX):-1]
+                    else:
+                        identifier = term
+                    if index._split(identifier)[0] is not None:
+                        index.add(identifier)
+        return index
@@ -1,13 +1,61 @@
+import contextlib
+import csv
+import functools
+import io
 import os
 import os.path as osp
 import random
+import re
 import socket
 import urllib.error
-from typing import Any, Callable
+from typing import IO, Any, Callable, Iterator
 
-from SPARQLWrapper import JSON, SPARQLWrapper, SPARQLExceptions
+from SPARQLWrapper import CSV, JSON, TSV, SPARQLWrapper, SPARQLExceptions
 
 from .exceptions import MalformedQueryException
+from .id_index import IDIndex
+
+
+ID_PATTERN = re.compile(r"[PQ][1-9][0-9]*")
+
+
+def parse_results_stream(stream: IO[bytes], return_format: str = TSV) -> Iterator[dict[str, str]]:
+    """Lazily parse SPARQL SELECT results in TSV or CSV format, yielding one
+    row at a time as a dict from variable name to the raw RDF term."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if return_format == TSV:
+        reader = csv.reader(text, delimiter="\t", quoting=csv.QUOTE_NONE)
+    elif return_format == CSV:
+        reader = csv.reader(text)
+    else:
+        raise ValueError(f"Unsupported streaming format {return_format}")
+
+    header = next(reader, None)
+    if header is None:
+        return
+    variables = [v.lstrip("?") for v in header]
+    for row in reader:
+        if row:
+            yield dict(zip(variables, row))
+
+
+def term_to_id(term: str) -> str:
+    """Extract the identifier from a raw URI term, e.g.
+    <http://wikidata.org/wiki/Q5> or http://wikidata.org/wiki/Q5."""
+    return term.rstrip(">").split("/")[-1]
+
+
+def reservoir_sample(items: Iterator, k: int) -> list:
+    """Uniformly sample up to k items from an iterator in a single pass."""
+    sample = []
+    for i, item in enumerate(items):
+        if i < k:
+            sample.append(item)
+        else:
+            j = int(random.random() * (i + 1))
+            if j < k:
+                sample[j] = item
+    return sample
 
 
 def tool(func):
@@ -39,13 +87,29 @@ class Tool:
 
 
 class GraphDBTool(Tool):
-    def __init__(self, endpoint: str, functions: list[str] = None):
+    def __init__(self, endpoint: str, functions: list[str] = None, max_batch_size: int = 10,
+                 id_index: IDIndex = None):
         super().__init__(functions)
+        self.max_batch_size = max_batch_size
+        self.id_index = id_index
+        # Batch tools state their size limit in the description the agent sees
+        self.tools = [self._format_description(t, max_batch_size=max_batch_size)
+                      if "{max_batch_size}" in t.__doc__ else t for t in self.tools]
         self.wrapper = SPARQLWrapper(endpoint)
         self.wrapper.setReturnFormat(JSON)
+        self.stream_wrapper = SPARQLWrapper(endpoint)
         self.queries_dict = dict()
         self.session_ids = set()
 
+    @staticmethod
+    def _format_description(method: Callable, **kwargs) -> Callable:
+        @functools.wraps(method)
+        def wrapper(*args, **kw):
+            return method(*args, **kw)
+
+        wrapper.__doc__ = method.__doc__.format(**kwargs)
+        return wrapper
+
     def _get_query(self, query_name: str):
         if query_name not in self.queries_dict:
             current_dir = osp.dirname(osp.abspath(__file__))
@@ -69,11 +133,12 @@ class GraphDBTool(Tool):
         except (urllib.error.URLError, ConnectionRefusedError, socket.timeout, socket.error):
             return False
 
-    def execute_query(self, query: str):
+    @staticmethod
+    @contextlib.contextmanager
+    def _query_errors(query: str):
+        """Translate errors raised while running a query into lmkg errors."""
         try:
-            self.wrapper.setQuery(query)
-            results = self.wrapper.query().convert()
-            return results
+            yield
         except (urllib.error.URLError, ConnectionRefusedError, socket.timeout, socket.error) as e:
             raise ConnectionError(f"Connection failed: {e}") from e
         except SPARQLExceptions.QueryBadFormed as sparql_exception:
@@ -82,8 +147,28 @@ class GraphDBTool(Tool):
                                           f"{query}\n"
                                           f"Original error: {sparql_exception}")
 
+    def execute_query(self, query: str):
+        with self._query_errors(query):
+            self.wrapper.setQuery(query)
+            results = self.wrapper.query().convert()
+            return results
+
+    def execute_query_stream(self, query: str, return_format: str = TSV) -> Iterator[dict[str, str]]:
+        """Run a SELECT query and parse the TSV or CSV results as they arrive,
+        so callers can stop reading early. Values are raw RDF terms."""
+        with self._query_errors(query):
+            self.stream_wrapper.setReturnFormat(return_format)
+            self.stream_wrapper.setQuery(query)
+            with contextlib.closing(self.stream_wrapper.query().response) as response:
+                yield from parse_results_stream(response, return_format)
+
     def check_id_in_graph(self, identifier: str):
         """Check if a given URI exists in some triple in the KG."""
+        if self.id_index is not None:
+            if identifier not in self.id_index:
+                raise KeyError(f"{identifier} not in kg")
+            return
+
         query = self._get_query(self.check_id_in_graph.__name__)
         query = query.replace("id0", identifier)
         result = self.execute_query(query)
@@ -92,23 +177,24 @@ class GraphDBTool(Tool):
         if not in_graph:
             raise KeyError(f"{identifier} not in kg")
 
+    def get_all_ids(self):
+        """Iterate over all Q and P identifiers in the KG, streaming the
+        results of a single query."""
+        query = self._get_query(self.get_all_ids.__name__)
+        for result in self.execute_query_stream(query):
+            entity_id = term_to_id(result["e"])
+            if ID_PATTERN.fullmatch(entity_id):
+                yield entity_id
+
     def get_neighbors(self, identifier: str, identifier_pos: str, variable_pos: str):
         self.check_id_in_graph(identifier)
 
         query = self._get_query(self.get_neighbors.__name__)
         query = query.replace("?variable", f"?{variable_pos}").replace(f"?{identifier_pos}", f"wiki:{identifier}")
-        results = self.execute_query(query)["results"]["bindings"]
-        random.shuffle(results)
-
-        output = []
-        for result in results:
-            uri = result[variable_pos]["value"]
-            entity_id = uri.split("/")[-1]
-            if entity_id.startswith("Q") or entity_id.startswith("P"):
-                output.append(entity_id)
-                self.session_ids.add(entity_id)
-            if len(output) == 5:
-                break
+        results = self.execute_query_stream(query)
+        entity_ids = (term_to_id(result[variable_pos]) for result in results)
+        output = reservoir_sample((i for i in entity_ids if ID_PATTERN.fullmatch(i)), 5)
+        self.session_ids.update(output)
 
         description_predicate = "rdfs:label" if variable_pos == "p" else "rdfs:comment"
         max_length = 150 if variable_pos == "p" else 300
@@ -142,6 +228,93 @@ class GraphDBTool(Tool):
 
         return output
 
+    def _split_batch(self, identifiers: list[str]) -> tuple[list[str], dict[str, str]]:
+        """Deduplicate identifiers and separate well-formed ones from those
+        that would corrupt a batched query, which get an error message."""
+        valid_ids = []
+        errors = dict()
+        for identifier in dict.fromkeys(identifiers):
+            if ID_PATTERN.fullmatch(identifier):
+                valid_ids.append(identifier)
+            else:
+                errors[identifier] = f"Error: {identifier} is not a valid identifier."
+        return valid_ids, errors
+
+    def _batch_too_large(self, identifiers: list[str]):
+        if len(identifiers) > self.max_batch_size:
+            return (f"Too many identifiers: got {len(identifiers)}, "
+                    f"but at most {self.max_batch_size} are allowed per call.")
+        return None
+
+    def get_descriptions_batch(self, identifiers: list[str], predicate: str, max_length: int = 300):
+        too_large = self._batch_too_large(identifiers)
+        if too_large:
+            return too_large
+
+        valid_ids, output = self._split_batch(identifiers)
+        descriptions = dict()
+        if valid_ids:
+            descriptions = self.get_descriptions(valid_ids, predicate, check_in_graph=False,
+                                                 max_length=max_length)
+
+        for identifier in valid_ids:
+            output[identifier] = descriptions.get(identifier,
+                                                  f"Error: no description of {identifier} "
+                                                  f"found in the knowledge graph.")
+        return output
+
+    def get_neighbors_batch(self, identifiers: list[str], identifier_pos: str, variable_pos: str):
+        too_large = self._batch_too_large(identifiers)
+        if too_large:
+            return too_large
+
+        valid_ids, output = self._split_batch(identifiers)
+        if self.id_index is not None:
+            for identifier in valid_ids:
+                if identifier not in self.id_index:
+                    output[identifier] = f"Error: {identifier} not in kg."
+            valid_ids = [i for i in valid_ids if i not in output]
+        if not valid_ids:
+            return output
+
+        # Each identifier gets its own LIMIT, so a large one cannot crowd out the rest
+        subquery = self._get_query(f"{self.get_neighbors_batch.__name__}_subquery").rstrip()
+        subquery = subquery.replace("?variable", f"?{variable_pos}").replace(f"?{identifier_pos}", "?id")
+        subqueries = "\n    UNION\n".join([subquery.replace("id0", i) for i in valid_ids])
+        query = self._get_query(self.get_neighbors_batch.__name__)
+        query = query.replace("?variable", f"?{variable_pos}").replace("subqueries", subqueries)
+        candidates = {identifier: [] for identifier in valid_ids}
+        with_rows = set()
+        for result in self.execute_query_stream(query):
+            identifier = term_to_id(result["id"])
+            entity_id = term_to_id(result[variable_pos])
+            with_rows.add(identifier)
+            if identifier in candidates and ID_PATTERN.fullmatch(entity_id):
+                candidates[identifier].append(entity_id)
+
+        neighbors = dict()
+        for identifier, entity_ids in candidates.items():
+            if identifier not in with_rows:
+                # Without an ID index, an identifier with no triples at all is reported as missing
+                output[identifier] = f"Error: {identifier} not in kg."
+                continue
+            neighbors[identifier] = random.sample(entity_ids, min(5, len(entity_ids)))
+            self.session_ids.update(neighbors[identifier])
+
+        description_predicate = "rdfs:label" if variable_pos == "p" else "rdfs:comment"
+        max_length = 150 if variable_pos == "p" else 300
+        all_neighbors = list(dict.fromkeys(n for sample in neighbors.values() for n in sample))
+        descriptions = dict()
+        if all_neighbors:
+            descriptions = self.get_descriptions(all_neighbors, description_predicate,
+                                                 check_in_graph=False, max_length=max_length)
+
+        for identifier, sample in neighbors.items():
+            sample_descriptions = {n: descriptions[n] for n in sample if n in descriptions}
+            output[identifier] = sample_descriptions if sample_descriptions else "No matches found."
+
+        return output
+
     @tool
     def get_entity_description(self, entity_id: str):
         """Retrieve description of an entity given its unique KG identifier.
@@ -251,6 +424,60 @@ class GraphDBTool(Tool):
         """
         return self.get_neighbors(predicate_id, "p", "o")
 
+    @tool
+    def get_entity_description_batch(self, entity_ids: list[str]):
+        """Retrieve descriptions of up to {max_batch_size} entities given their unique KG identifiers.
+
+        Args:
+            entity_ids: Identifiers of the entities in the knowledge graph.
+        """
+        return self.get_descriptions_batch(entity_ids, "rdfs:comment")
+
+    @tool
+    def get_predicate_description_batch(self, predicate_ids: list[str]):
+        """Retrieve descriptions of up to {max_batch_size} predicates given their unique KG identifiers.
+
+        Args:
+            predicate_ids: Identifiers of the predicates in the knowledge graph.
+        """
+        return self.get_descriptions_batch(predicate_ids, "rdfs:label")
+
+    @tool
+    def get_predicates_with_subject_batch(self, entity_ids: list[str]):
+        """For each of up to {max_batch_size} entities, return a random list of predicates for which it appears as the subject in the knowledge graph.
+
+        Args:
+            entity_ids: the IDs of the entities in the knowledge graph.
+        """
+        return self.get_neighbors_batch(entity_ids, "s", "p")
+
+    @tool
+    def get_predicates_with_object_batch(self, entity_ids: list[str]):
+        """For each of up to {max_batch_size} entities, return a random list of predicates for which it appears as the object in the knowledge graph.
+
+        Args:
+            entity_ids: the IDs of the entities in the knowledge graph.
+        """
+        return self.get_neighbors_batch(entity_ids, "o", "p")
+
+    @tool
+    def get_subject_entities_batch(self, predicate_ids: list[str]):
+        """For each of up to {max_batch_size} predicates, return a random list of entities that appear as subjects in triples with it.
+
+        Args:
+            predicate_ids: the IDs of the predicates in the knowledge graph.
+        """
+        return self.get_neighbors_batch(predicate_ids, "p", "s")
+
+    @tool
+    def get_object_entities_batch(self, predicate_ids: list[str]):
+        """For each of up to {max_batch_size} predicates, return a random list of entities that appear as objects in triples with it.
+
+        Args:
+            predicate_ids: the IDs of the predicates in the knowledge graph.
+        """
+        return self.get_neighbors_batch(predicate_ids, "p", "o")
+
 
 class AnswerStoreTool(Tool):
     def __init__(self, graphdb_tool: GraphDBTool, answer_parser: Callable[[str], Any] = None):
@@ -277,9 +504,15 @@ class AnswerStoreTool(Tool):
                 self.answer, ids_in_answer = self.answer_parser(answer)
                 valid_ids = self.graphdb.session_ids.union(self.initial_ids if self.initial_ids else set())
                 hallucinated_ids = ids_in_answer.difference(valid_ids)
+                if self.graphdb.id_index is not None:
+                    # IDs seen elsewhere are accepted as long as they exist in the KG
+                    hallucinated_ids = {i for i in hallucinated_ids if i not in self.graphdb.id_index}
+                    reason = "do not exist in the knowledge graph"
+                else:
+                    reason = "were not retrieved by any function"
                 if hallucinated_ids:
-                    return_string = (f"The answer contains identifiers that were not retrieved "
-                                     f"by any function: {', '.join(hallucinated_ids)}. Please try again.")
+                    return_string = (f"The answer contains identifiers that {reason}: "
+                                     f"{', '.join(hallucinated_ids)}. Please try again.")
             except Exception as e:
                 return_string = f"Error parsing answer: {e}"
         else:
@@ -1,9 +1,9 @@
 import asyncio
-import json
 import os
 import os.path as osp
 import re
 
+import orjson
 import yaml
 from langgraph.errors import GraphRecursionError
 from tap import Tap
@@ -11,13 +11,13 @@ from tqdm import tqdm
 
 from lmkg.agent import LMKGAgent
 from lmkg.exceptions import MalformedQueryException
-from utils import count_lines, get_timestamp_and_hash
+from utils import BackgroundReader, BackgroundWriter, count_lines, get_timestamp_and_hash
 
 
 class Arguments(Tap):
     file_path: str = None
     start: int = 0  # Starting line number (0-based)
-    end: int = None  # Ending line number (inclusive, 0-based)
+    end: int = None  # Ending line number (inclusive, 0-based). If not set, lines are counted first
     maximum: int = None  # Maximum number of instances to generate
 
     graphdb_endpoint: str = "http://localhost:7200/repositories/wikidata5m"
@@ -25,6 +25,8 @@ class Arguments(Tap):
     functions: list[str] = None
     timeout: int = None
     recursion_limit: int = None
+    max_batch_size: int = 10  # Maximum number of identifiers per call to a batch function
+    id_index: str = None  # Path to an ID index built with build_id_index.py
 
     config_file: str = None
 
@@ -60,7 +62,9 @@ def main(args: Arguments):
         graphdb_endpoint=args.graphdb_endpoint,
         answer_parser=answer_parser,
         timeout=args.timeout,
-        recursion_limit=args.recursion_limit
+        recursion_limit=args.recursion_limit,
+        max_batch_size=args.max_batch_size,
+        id_index_path=args.id_index
     )
 
     input_filename = osp.basename(args.file_path)
@@ -72,7 +76,9 @@ def main(args: Arguments):
     output_log = osp.join(output_dir, "log.txt")
     output_file = osp.join(output_dir, f"contradicted-{input_filename}")
 
-    # If end is not specified, process until the end of the file
+    # If end is not specified, process until the end of the file. For compressed
+    # input this means an extra full decompression pass before generation starts,
+    # so set end explicitly on large splits.
     if args.end is None:
         total_lines = count_lines(args.file_path)
         args.end = total_lines - 1
@@ -86,7 +92,8 @@ def main(args: Arguments):
                          f"but maximum is set to {args.maximum}")
 
     num_generated = 0
-    with open(args.file_path) as f_in, open(output_file, "w") as f_out, open(output_log, "w", buffering=1) as f_log:
+    with BackgroundReader(args.file_path) as f_in, BackgroundWriter(output_file) as f_out, \
+            open(output_log, "w", buffering=1) as f_log:
         yaml.dump(args.as_dict(), f_log, sort_keys=False, default_flow_style=False)
         # Skip lines until we reach the start line
         for i in range(args.start):
@@ -102,7 +109,7 @@ def main(args: Arguments):
                 if current_line_num > args.end:
                     break
 
-                data = json.loads(line)
+                data = orjson.loads(line)
                 passage = data['input']
                 triple_ids = data['meta_obj']['non_formatted_wikidata_id_output']
                 triple_labels = data['output'][0]['non_formatted_surface_output']
@@ -146,7 +153,7 @@ def main(args: Arguments):
 
                 if not errors:
                     data['output'].append(answer)
-                    f_out.write(f"{json.dumps(data)}\n")
+                    f_out.write(data)
                     num_generated += 1
                     if args.maximum:
                         bar.update()
@@ -0,0 +1,54 @@
+import pytest
+from lmkg.id_index import IDIndex
+
+
+def test_membership():
+    index = IDIndex(["Q1", "Q42", "P31", "Q42"])
+
+    assert len(index) == 3
+    assert "Q42" in index
+    assert "P31" in index
+    assert "Q31" not in index
+    assert "P42" not in index
+    assert "Q100000" not in index
+    assert "X1" not in index
+    assert "Q" not in index
+    assert "Q042" not in index
+    assert "Q0" not in index
+
+    with pytest.raises(ValueError):
+        index.add("Q042")
+
+
+def test_save_and_load(tmp_path):
+    index = IDIndex(["Q5", "Q1000", "P131"])
+    path = tmp_path / "ids.idx"
+    index.save(path)
+
+    loaded = IDIndex.load(path)
+    assert len(loaded) == 3
+    assert loaded.nbytes == index.nbytes
+    assert {"Q5", "Q1000", "P131"} == {i for i in ["Q5", "Q1000", "P131", "Q6"] if i in loaded}
+
+
+def test_from_triples(tmp_path):
+    path = tmp_path / "triples.txt"
+    path.write_text("Q1\tP31\tQ5\n"
+                    "<http://wikidata.org/wiki/Q2> <http://wikidata.org/wiki/P17> <http://wikidata.org/wiki/Q3> .\n"
+                    '<http://wikidata.org/wiki/Q2> <http://www.w3.org/2000/01/rdf-schema#label> "Q9 label" .\n')
+
+    index = IDIndex.from_triples(path)
+    assert {"Q1", "P31", "Q5", "Q2", "P17", "Q3"} == {i for i in ["Q1", "P31", "Q5", "Q2", "P17", "Q3", "Q9"]
+                                                      if i in index}
+
+
+def test_rejects_foreign_and_huge_ids(tmp_path):
+    path = tmp_path / "triples.nt"
+    path.write_text("<http://x/Q99999999999> <http://wikidata.org/wiki/P31> <http://wikidata.org/wiki/Q5> .\n")
+
+    index = IDIndex.from_triples(path)
+    assert len(index) == 2
+    assert index.nbytes < 16
+
+    with pytest.raises(ValueError):
+        index.add("Q99999999999")
@@ -0,0 +1,53 @@
+import orjson
+import pytest
+from utils import BackgroundReader, BackgroundWriter, count_lines
+
+
+@pytest.mark.parametrize("extension", [".jsonl", ".jsonl.gz", ".jsonl.bz2", ".jsonl.xz"])
+def test_roundtrip(tmp_path, extension):
+    path = str(tmp_path / f"data{extension}")
+    records = [{"input": f"passage {i}", "output": [{"label": "Amsterdam – Nederland"}]} for i in range(1000)]
+
+    with BackgroundWriter(path, max_batch_size=16) as writer:
+        for record in records:
+            writer.write(record)
+
+    assert count_lines(path) == len(records)
+    with BackgroundReader(path, buffer_size=2, chunk_size=256) as reader:
+        assert next(reader) is not None
+        assert [orjson.loads(line) for line in reader] == records[1:]
+
+
+def test_reader_stops_early(tmp_path):
+    path = str(tmp_path / "data.jsonl.gz")
+    with BackgroundWriter(path) as writer:
+        for i in range(10000):
+            writer.write({"i": i})
+
+    with BackgroundReader(path, buffer_size=4) as reader:
+        assert orjson.loads(next(reader)) == {"i": 0}
+    assert not reader.thread.is_alive()
+
+
+def test_writer_encoding_error(tmp_path):
+    path = str(tmp_path / "data.jsonl.gz")
+    with BackgroundWriter(path) as writer:
+        writer.write({"i": 0})
+        with pytest.raises(TypeError):
+            writer.write({"unserializable": object()})
+        writer.write({"i": 1})
+
+    with BackgroundReader(path) as reader:
+        assert [orjson.loads(line) for line in reader] == [{"i": 0}, {"i": 1}]
+
+
+def test_writer_does_not_mask_body_exception(tmp_path):
+    path = str(tmp_path / "missing" / "data.jsonl")
+    with pytest.raises(RuntimeError):
+        with BackgroundWriter(path) as writer:
+            writer.thread.join()
+            raise RuntimeError("body failed")
+
+    with pytest.raises(FileNotFoundError):
+        with BackgroundWriter(path):
+            pass
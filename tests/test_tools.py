@@ -0,0 +1,160 @@
+import io
+import urllib.error
+
+import pytest
+from SPARQLWrapper import SPARQLExceptions
+from lmkg.exceptions import MalformedQueryException
+from lmkg.id_index import IDIndex
+from lmkg.tools import CSV, AnswerStoreTool, GraphDBTool, parse_results_stream, reservoir_sample, term_to_id
+
+
+WIKI = "http://wikidata.org/wiki/"
+
+
+def bindings(*rows):
+    return {"results": {"bindings": [{k: {"value": v} for k, v in row.items()} for row in rows]}}
+
+
+@pytest.fixture
+def graphdb(monkeypatch):
+    db = GraphDBTool("http://localhost:7200/repositories/test", max_batch_size=3)
+    db.executed_queries = []
+
+    def execute_query(query):
+        db.executed_queries.append(query)
+        if "?description" in query:
+            return bindings({"id": f"{WIKI}Q1", "description": "first"},
+                            {"id": f"{WIKI}Q2", "description": "second"},
+                            {"id": f"{WIKI}P31", "description": "instance of"})
+        return bindings()
+
+    def execute_query_stream(query):
+        db.executed_queries.append(query)
+        tsv = (f"?id\t?p\n"
+               f"<{WIKI}Q1>\t<{WIKI}P31>\n"
+               f"<{WIKI}Q1>\t<http://www.w3.org/2000/01/rdf-schema#label>\n"
+               f"<{WIKI}Q1>\t\"see http://x.org/Quux\"@en\n")
+        return parse_results_stream(io.BytesIO(tsv.encode()))
+
+    monkeypatch.setattr(db, "execute_query", execute_query)
+    monkeypatch.setattr(db, "execute_query_stream", execute_query_stream)
+    return db
+
+
+def test_description_batch_reports_errors_per_id(graphdb):
+    result = graphdb.get_entity_description_batch(["Q1", "Q2", "Q3;"])
+
+    assert len(graphdb.executed_queries) == 1
+    assert result["Q1"] == "first"
+    assert result["Q2"] == "second"
+    assert result["Q3;"].startswith("Error")
+
+
+def test_description_batch_size_limit(graphdb):
+    result = graphdb.get_entity_description_batch(["Q1", "Q2", "Q3", "Q4"])
+
+    assert isinstance(result, str)
+    assert not graphdb.executed_queries
+
+
+def test_batch_tool_descriptions_state_limit(graphdb):
+    tools = {t.__name__: t for t in graphdb.tools}
+
+    assert "up to 3 entities" in tools["get_entity_description_batch"].__doc__
+    assert "up to 3 predicates" in tools["get_object_entities_batch"].__doc__
+    assert tools["get_entity_description"].__doc__ == GraphDBTool.get_entity_description.__doc__
+    assert tools["get_entity_description_batch"](["Q1"]) == {"Q1": "first"}
+
+
+def test_neighbors_batch(graphdb):
+    result = graphdb.get_predicates_with_subject_batch(["Q1", "Q2"])
+
+    assert len(graphdb.executed_queries) == 2
+    assert result["Q1"] == {"P31": "instance of"}
+    assert result["Q2"].startswith("Error")
+    assert "P31" in graphdb.session_ids
+
+
+def test_neighbors_batch_with_index(graphdb):
+    graphdb.id_index = IDIndex(["Q1", "Q3"])
+    result = graphdb.get_predicates_with_subject_batch(["Q1", "Q2", "Q١٢"])
+
+    assert "wiki:Q2 " not in graphdb.executed_queries[0]
+    assert result["Q1"] == {"P31": "instance of"}
+    assert result["Q2"] == "Error: Q2 not in kg."
+    assert result["Q١٢"].startswith("Error")
+
+
+def test_neighbors_batch_limit_per_id(graphdb, monkeypatch):
+    def execute_query_stream(query):
+        graphdb.executed_queries.append(query)
+        rows = [f"<{WIKI}P31>\t<{WIKI}Q{i}>" for i in range(100, 120)] + [f"<{WIKI}P17>\t<{WIKI}Q2>"]
+        return parse_results_stream(io.BytesIO("\n".join(["?id\t?s"] + rows).encode()))
+
+    monkeypatch.setattr(graphdb, "execute_query_stream", execute_query_stream)
+    result = graphdb.get_subject_entities_batch(["P31", "P17"])
+
+    assert graphdb.executed_queries[0].count("LIMIT 10000") == 2
+    assert result["P17"] == {"Q2": "second"}
+    assert result["P31"] == "No matches found."
+
+
+def test_check_id_in_graph_with_index(graphdb):
+    graphdb.id_index = IDIndex(["Q1"])
+
+    graphdb.check_id_in_graph("Q1")
+    with pytest.raises(KeyError):
+        graphdb.check_id_in_graph("Q2")
+    assert not graphdb.executed_queries
+
+
+def test_parse_results_stream():
+    tsv = io.BytesIO(f'?e\t?label\n<{WIKI}Q5>\t"human"@en\n\n<{WIKI}P31>\t"instance of"\n'.encode())
+    rows = parse_results_stream(tsv)
+    first = next(rows)
+    assert first == {"e": f"<{WIKI}Q5>", "label": '"human"@en'}
+    assert term_to_id(first["e"]) == "Q5"
+    assert [term_to_id(r["e"]) for r in rows] == ["P31"]
+
+    csv = io.BytesIO(f'e,label\r\n{WIKI}Q5,"human, person"\r\n'.encode())
+    rows = list(parse_results_stream(csv, CSV))
+    assert rows == [{"e": f"{WIKI}Q5", "label": "human, person"}]
+    assert term_to_id(rows[0]["e"]) == "Q5"
+
+
+def test_reservoir_sample():
+    assert sorted(reservoir_sample(iter(range(3)), 5)) == [0, 1, 2]
+    sample = reservoir_sample(iter(range(100)), 5)
+    assert len(sample) == 5 and len(set(sample)) == 5
+
+
+def test_neighbors(graphdb):
+    graphdb.id_index = IDIndex(["Q1"])
+    result = graphdb.get_predicates_with_subject("Q1")
+
+    assert result["P31"] == "instance of"
+    assert graphdb.session_ids == {"P31"}
+    assert "Quux" not in graphdb.executed_queries[-1]
+
+
+def test_query_errors_are_translated():
+    db = GraphDBTool("http://localhost:7200/repositories/test")
+
+    with pytest.raises(ConnectionError):
+        with db._query_errors("ASK {}"):
+            raise urllib.error.URLError("refused")
+    with pytest.raises(MalformedQueryException):
+        with db._query_errors("ASK {"):
+            raise SPARQLExceptions.QueryBadFormed()
+
+
+def test_submit_final_answer_with_index(graphdb):
+    answer_store = AnswerStoreTool(graphdb, lambda answer: (answer, set(answer.split())))
+    answer_store.initialize({"Q1"})
+
+    assert "not retrieved" in answer_store.submit_final_answer("Q1 Q2")
+
+    graphdb.id_index = IDIndex(["Q1", "Q2"])
+    assert answer_store.submit_final_answer("Q1 Q2") == "Answer submitted"
+    result = answer_store.submit_final_answer("Q1 Q042")
+    assert "do not exist in the knowledge graph: Q042" in result
@@ -1,7 +1,19 @@
+import bz2
 import datetime
+import gzip
+import lzma
+import os.path as osp
+import queue
 import random
 import subprocess
 import hashlib
+import threading
+
+import orjson
+
+
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+_END = object()
 
 
 def get_timestamp_and_hash():
@@ -14,6 +26,132 @@ def get_timestamp_and_hash():
     return f"{timestamp}-{random_hash}"
 
 
+def open_file(file_path, mode="rb"):
+    """Open a file in binary mode, (de)compressing it based on its extension."""
+    opener = COMPRESSED_OPENERS.get(osp.splitext(file_path)[1], open)
+    return opener(file_path, mode)
+
+
 def count_lines(file_path):
-    result = subprocess.run(['wc', '-l', file_path], capture_output=True, text=True)
-    return int(result.stdout.split()[0])
+    if osp.splitext(file_path)[1] not in COMPRESSED_OPENERS:
+        result = subprocess.run(['wc', '-l', file_path], capture_output=True, text=True)
+        return int(result.stdout.split()[0])
+
+    with open_file(file_path) as f:
+        return sum(chunk.count(b"\n") for chunk in iter(lambda: f.read(1 << 20), b""))
+
+
+class BackgroundReader:
+    """Iterate over the lines of a possibly compressed file, while a
+    background thread reads and decompresses the following chunks of lines."""
+    def __init__(self, file_path, buffer_size=16, chunk_size=1 << 20):
+        self.queue = queue.Queue(maxsize=buffer_size)
+        self.chunk_size = chunk_size
+        self.chunk = iter(())
+        self.stop_event = threading.Event()
+        self.done = False
+        self.thread = threading.Thread(target=self._read, args=(file_path,), daemon=True)
+        self.thread.start()
+
+    def _put(self, item):
+        while not self.stop_event.is_set():
+            try:
+                self.queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _read(self, file_path):
+        try:
+            with open_file(file_path) as f:
+                # Queue chunks of roughly chunk_size bytes, so the per-item
+                # queue overhead is paid once per chunk rather than per line
+                for chunk in iter(lambda: f.readlines(self.chunk_size), []):
+                    if not self._put(chunk):
+                        return
+        except Exception as e:
+            self._put(e)
+        self._put(_END)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        for line in self.chunk:
+            return line
+        if self.done:
+            raise StopIteration
+        item = self.queue.get()
+        if item is _END:
+            self.done = True
+            raise StopIteration
+        if isinstance(item, Exception):
+            self.done = True
+            raise item
+        self.chunk = iter(item)
+        return next(self.chunk)
+
+    def close(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class BackgroundWriter:
+    """Write records as JSON lines to a possibly compressed file. Records are
+    encoded when written, so encoding errors surface at the failing record.
+    Compression and writing happen in a background thread, which writes all
+    lines queued so far in a single batch."""
+    def __init__(self, file_path, max_batch_size=256):
+        self.queue = queue.Queue()
+        self.max_batch_size = max_batch_size
+        self.error = None
+        self.thread = threading.Thread(target=self._write, args=(file_path,), daemon=True)
+        self.thread.start()
+
+    def _write(self, file_path):
+        try:
+            with open_file(file_path, "wb") as f:
+                done = False
+                while not done:
+                    batch = [self.queue.get()]
+                    while len(batch) < self.max_batch_size:
+                        try:
+                            batch.append(self.queue.get_nowait())
+                        except queue.Empty:
+                            break
+                    if batch[-1] is _END:
+                        batch.pop()
+                        done = True
+                    f.write(b"".join(batch))
+        except Exception as e:
+            self.error = e
+
+    def write(self, record):
+        if self.error is not None:
+            raise self.error
+        self.queue.put(orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE))
+
+    def _finish(self):
+        self.queue.put(_END)
+        self.thread.join()
+
+    def close(self):
+        self._finish()
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._finish()
+        # Don't mask an exception raised in the body of the with statement
+        if exc_type is None and self.error is not None:
+            raise self.error